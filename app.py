@@ -1,22 +1,90 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, send_from_directory
 from engine import (
     calculate_energy_profile,
     recommend_ecoflow_tiers,
     archetypes_db,
     ecoflow_tiers_db,
-    packs_ac1p_db,
-    packs_ac3p_db,
-    packs_dc12v_db,
-    packs_dc24v_db,
-    packs_dc48v_db,
+    get_pack_db,
     solar_generation_db,
+    warm_pack_tables,
 )
 
+import functools
+import gzip
+import hashlib
+import json
 import os
+from typing import Any, List, Optional, Union
+
+import msgspec
+
+try:
+    import orjson
+except ImportError:  # optional C accelerator, stdlib json is the fallback
+    orjson = None
 
 app = Flask(__name__)
 
 
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def ojsonify(obj):
+    """
+    Drop-in for flask.jsonify that serializes with orjson when available.
+    """
+    return app.response_class(_dumps(obj), mimetype="application/json")
+
+
+# Static datasets never change after import, so /api/init is serialized once.
+_INIT_PAYLOAD = _dumps(
+    {
+        "archetypes": archetypes_db,
+        "packs": {
+            group: get_pack_db(group)
+            for group in ("ac1p", "ac3p", "dc12", "dc24", "dc48")
+        },
+        "tiers": ecoflow_tiers_db,
+        "solar": solar_generation_db,
+    }
+)
+# band tables behind /api/calculate, built at import so preloaded workers share them
+warm_pack_tables()
+
+_INIT_ETAG = hashlib.blake2b(_INIT_PAYLOAD, digest_size=16).hexdigest()
+_INIT_MAX_AGE = 3600
+
+# client accepts gzip -> (file under static/, body, etag)
+_INIT_VARIANTS = {
+    False: ("init.json", _INIT_PAYLOAD, _INIT_ETAG),
+    True: ("init.json.gz", gzip.compress(_INIT_PAYLOAD, mtime=0), f"{_INIT_ETAG}-gzip"),
+}
+
+
+def _write_init_files() -> bool:
+    """
+    Mirror the init payload into static/ so it is sent straight from disk
+    (sendfile under gunicorn, or nginx gzip_static: see deploy/nginx.conf).
+    Returns False when the tree is read-only; /api/init then serves from memory.
+    """
+    try:
+        for filename, body, _etag in _INIT_VARIANTS.values():
+            path = os.path.join(app.static_folder, filename)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+    except OSError:
+        return False
+    return True
+
+
+_INIT_ON_DISK = _write_init_files()
+
+
 # --------- PAGE ROUTES ---------
 
 
@@ -64,28 +132,113 @@ def datasets(filename: str):
     return send_from_directory(datasets_dir, filename)
 
 
-# --------- API ENDPOINTS (unchanged) ---------
+# --------- API ENDPOINTS ---------
 
 
 @app.route("/api/init", methods=["GET"])
 def api_init():
-    packs = {
-        "ac1p": packs_ac1p_db,
-        "ac3p": packs_ac3p_db,
-        "dc12": packs_dc12v_db,
-        "dc24": packs_dc24v_db,
-        "dc48": packs_dc48v_db,
-    }
-    return jsonify(
-        {
-            "archetypes": archetypes_db,
-            "packs": packs,
-            "tiers": ecoflow_tiers_db,
-            "solar": solar_generation_db,
-        }
+    gzipped = request.accept_encodings["gzip"] > 0
+    filename, body, etag = _INIT_VARIANTS[gzipped]
+
+    if _INIT_ON_DISK:
+        response = send_from_directory(
+            app.static_folder,
+            filename,
+            mimetype="application/json",
+            etag=etag,
+            conditional=True,
+            max_age=_INIT_MAX_AGE,
+        )
+    else:
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+
+    if gzipped:
+        response.content_encoding = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = _INIT_MAX_AGE
+    return response
+
+
+class PackPick(msgspec.Struct):
+    key: Optional[str] = None
+    group: Optional[str] = "ac1p"
+    # fractional values are truncated, as int() always did
+    usage_index: Union[int, float] = 1
+
+
+class CalculateRequest(msgspec.Struct):
+    archetype_id: Optional[str] = None
+    archetype: Optional[str] = None  # legacy name for archetype_id
+    expert_mode: Optional[bool] = None
+    # rich picks, or bare keys (legacy: AC1P pack with typical usage);
+    # null picks are kept and simply match no pack, as before
+    packs: Optional[List[Union[PackPick, str, None]]] = None
+    city: Optional[str] = None
+    # number, numeric string, or any falsy value for "no solar"
+    solar_wp: Any = None
+
+
+# strict=False keeps the old lenient coercions ("2" -> 2, "true" -> True)
+_calculate_decoder = msgspec.json.Decoder(CalculateRequest, strict=False)
+
+
+def _packs_key(packs: Optional[List[Union[PackPick, str, None]]]) -> tuple:
+    """
+    Canonical hashable form of the requested packs: (group, key, usage_index).
+    Order is kept because it is echoed back as selected_packs.
+    """
+    if not packs:
+        return ()
+    return tuple(
+        ("ac1p", pick, 1)
+        if pick is None or isinstance(pick, str)
+        else (pick.group, pick.key, int(pick.usage_index))
+        for pick in packs
     )
 
 
+def _calc_body(archetype_id, packs_key, expert_mode, city, solar_wp) -> bytes:
+    """
+    Serialized /api/calculate body for a canonical request.
+    The engine is pure over the static datasets, so results are safe to reuse.
+    """
+    profile = calculate_energy_profile(
+        archetype_id,
+        expert_mode=expert_mode,
+        rich_packs=[
+            {"group": group, "key": key, "usage_index": usage_index}
+            for group, key, usage_index in packs_key
+        ],
+        city=city,
+        solar_wp=solar_wp,
+    )
+
+    recommendations = recommend_ecoflow_tiers(profile)
+
+    # profile and recommendations are serialized on their own and spliced
+    # into the envelope, so the wrapper dict is never built or walked
+    return (
+        b'{"profile":'
+        + _dumps(profile)
+        + b',"recommendations":'
+        + _dumps(recommendations)
+        + b"}"
+    )
+
+
+_calc_cached = functools.lru_cache(maxsize=4096)(_calc_body)
+
+# Cache keys (and the selected_packs echoed in each cached body) grow with the
+# pack list, so only requests up to this many picks are memoized. The datasets
+# hold well under this many distinct packs.
+_CACHE_MAX_PACKS = 64
+
+
 @app.route("/api/calculate", methods=["POST"])
 def api_calculate():
     """
@@ -103,48 +256,40 @@ def api_calculate():
       }
     """
     try:
-        data = request.get_json() or {}
+        req = _calculate_decoder.decode(request.get_data())
 
-        archetype_id = data.get("archetype_id") or data.get("archetype")
+        archetype_id = req.archetype_id or req.archetype
         if not archetype_id:
             return (
-                jsonify({"error": "archetype_id (veya archetype) gereklidir."}),
+                ojsonify({"error": "archetype_id (veya archetype) gereklidir."}),
                 400,
             )
 
-        packs_raw = data.get("packs", [])
-        rich_packs = None
-        simple_packs = None
-
-        if packs_raw:
-            if isinstance(packs_raw[0], dict):
-                rich_packs = packs_raw
-            else:
-                simple_packs = packs_raw
+        solar_wp = req.solar_wp or None
+        if isinstance(solar_wp, str):
+            solar_wp = float(solar_wp)
 
-        expert_mode = bool(data.get("expert_mode", False))
-        city = data.get("city")
-        solar_wp = data.get("solar_wp")
-
-        profile = calculate_energy_profile(
+        packs_key = _packs_key(req.packs)
+        calc = _calc_cached if len(packs_key) <= _CACHE_MAX_PACKS else _calc_body
+        body = calc(
             archetype_id,
-            simple_packs,
-            expert_mode=expert_mode,
-            rich_packs=rich_packs,
-            city=city,
-            solar_wp=solar_wp,
+            packs_key,
+            bool(req.expert_mode),
+            req.city,
+            solar_wp,
         )
 
-        recommendations = recommend_ecoflow_tiers(profile)
-
-        return jsonify({"profile": profile, "recommendations": recommendations})
+        return app.response_class(body, mimetype="application/json")
 
+    except msgspec.DecodeError:
+        return ojsonify({"error": "Geçersiz istek verisi (JSON)."}), 400
     except (ValueError, KeyError) as e:
-        return jsonify({"error": str(e)}), 400
+        return ojsonify({"error": str(e)}), 400
     except Exception as e:
         print("Internal error in /api/calculate:", e)
-        return jsonify({"error": "Sunucu tarafında bir hata oluştu."}), 500
+        return ojsonify({"error": "Sunucu tarafında bir hata oluştu."}), 500
 
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=8000)
+    # dev server only; production runs under gunicorn (see gunicorn_conf.py)
+    app.run(debug=bool(os.environ.get("FLASK_DEV")), host="0.0.0.0", port=8000)
@@ -1,6 +1,24 @@
+import bisect
+import functools
 import json
+import math
 import os
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional, only the vectorized path for huge pack lists
+    np = None
+
+try:
+    import orjson
+except ImportError:  # optional C accelerator, stdlib json is the fallback
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # optional JIT (needs NumPy), the masked reduction is the fallback
+    njit = None
 
 # ---------- Paths & loaders ----------
 
@@ -11,49 +29,244 @@ def load_db(filename: str) -> Dict[str, Any]:
     path = os.path.join(DATA_DIR, filename)
     if not os.path.exists(path):
         raise FileNotFoundError(f"Dataset file not found: {path}")
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 # ---------- Databases ----------
+# Archetypes, tiers and solar are needed by every calculation and load eagerly.
+# Pack dbs load on first use of their group (see get_pack_db).
 
 archetypes_db: Dict[str, Any] = load_db("archetypes.json")
 ecoflow_tiers_db: Dict[str, Any] = load_db("ecoflow_tiers.json")
-packs_ac1p_db: Dict[str, Any] = load_db("packs-AC1P.json")
-packs_ac3p_db: Dict[str, Any] = load_db("packs-AC3P.json")
-packs_dc12v_db: Dict[str, Any] = load_db("packs-DC12V.json")
-packs_dc24v_db: Dict[str, Any] = load_db("packs-DC24V.json")
-packs_dc48v_db: Dict[str, Any] = load_db("packs-DC48V.json")
 solar_generation_db: Dict[str, Any] = load_db("solar_generation.json")
 
+# group alias -> pack dataset file
+_PACK_FILES: Dict[str, str] = {
+    alias: filename
+    for aliases, filename in (
+        (("ac1p", "ac", "ac_1p"), "packs-AC1P.json"),
+        (("ac3p", "ac_3p"), "packs-AC3P.json"),
+        (("dc12", "dc12v"), "packs-DC12V.json"),
+        (("dc24", "dc24v"), "packs-DC24V.json"),
+        (("dc48", "dc48v"), "packs-DC48V.json"),
+    )
+    for alias in aliases
+}
 
-# ---------- Helpers ----------
 
-def _get_pack_db(group: str) -> Dict[str, Any]:
+@functools.lru_cache(maxsize=None)
+def _load(filename: str) -> Dict[str, Any]:
+    return load_db(filename)
+
+
+def _pack_file(group: str) -> str:
     group = (group or "").lower()
-    if group in {"ac1p", "ac", "ac_1p"}:
-        return packs_ac1p_db
-    if group in {"ac3p", "ac_3p"}:
-        return packs_ac3p_db
-    if group in {"dc12", "dc12v"}:
-        return packs_dc12v_db
-    if group in {"dc24", "dc24v"}:
-        return packs_dc24v_db
-    if group in {"dc48", "dc48v"}:
-        return packs_dc48v_db
-    raise KeyError(f"Unknown pack group: {group}")
+    filename = _PACK_FILES.get(group)
+    if filename is None:
+        raise KeyError(f"Unknown pack group: {group}")
+    return filename
+
+
+def get_pack_db(group: str) -> Dict[str, Any]:
+    return _load(_pack_file(group))
 
 
+# ---------- Helpers ----------
+
 def _safe_band(value: Any) -> Tuple[float, float, float]:
-    if not isinstance(value, (list, tuple)) or len(value) != 3:
-        return (0.0, 0.0, 0.0)
+    # unpacking also rejects non-sequences and anything not exactly 3 long
     try:
-        m0 = float(value[0])
-        m1 = float(value[1])
-        m2 = float(value[2])
+        m0, m1, m2 = value
+        return (float(m0), float(m1), float(m2))
     except (TypeError, ValueError):
         return (0.0, 0.0, 0.0)
-    return (m0, m1, m2)
+
+
+# ---------- Pre-normalized bands ----------
+# The datasets are immutable after load, so bands are validated once per
+# dataset instead of on every request. Kept beside the dbs so /api/init is
+# unchanged.
+
+Band = Tuple[float, float, float]
+
+
+def _pack_bands(pack_db: Dict[str, Any]) -> Dict[str, Tuple[Band, Band]]:
+    return {
+        key: (_safe_band(pack.get("kwh_day")), _safe_band(pack.get("peak_w")))
+        for key, pack in pack_db.items()
+        if pack
+    }
+
+
+class PackTable(NamedTuple):
+    # pack key -> (kwh_band, peak_band)
+    bands: Dict[str, Tuple[Band, Band]]
+    # pack key -> row into the _pack_arrays of the same file
+    rows: Dict[str, int]
+
+
+@functools.lru_cache(maxsize=None)
+def _pack_table(filename: str) -> PackTable:
+    bands = _pack_bands(_load(filename))
+    return PackTable(
+        bands=bands,
+        rows={key: row for row, key in enumerate(bands)},
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _pack_arrays(filename: str) -> Tuple[Any, Any]:
+    """
+    Same bands as struct-of-arrays (kwh, peak), both shape (N, 3).
+    Only the vectorized path needs them, so they are built on its first use.
+    """
+    bands = _pack_table(filename).bands.values()
+    kwh = np.array([b[0] for b in bands], dtype=np.float64).reshape(-1, 3)
+    peak = np.array([b[1] for b in bands], dtype=np.float64).reshape(-1, 3)
+    return kwh, peak
+
+
+# usage_index -> which (min, avg, max) columns a pack feeds.
+# "typical" also broadens the band, so it feeds all three.
+_USAGE_MASK = (
+    (True, False, False),
+    (True, True, True),
+    (False, False, True),
+)
+
+if njit is not None:
+
+    @njit(cache=True, boundscheck=False)
+    def _aggregate(kwh, peak, idx, use):
+        """
+        Native version of the per-pack loop in compute_load_profile.
+        Returns (min_kwh, avg_kwh, max_kwh, peak_min, peak_avg, peak_max).
+        """
+        a = b = c = 0.0
+        pa = pb = pc = 0.0
+        for i in range(idx.shape[0]):
+            k = idx[i]
+            u = use[i]
+            if u == 0:
+                a += kwh[k, 0]
+                if peak[k, 0] > pa:
+                    pa = peak[k, 0]
+            elif u == 1:
+                b += kwh[k, 1]
+                if peak[k, 1] > pb:
+                    pb = peak[k, 1]
+                # broaden band when "typical" is chosen
+                a += kwh[k, 0]
+                c += kwh[k, 2]
+                if peak[k, 0] > pa:
+                    pa = peak[k, 0]
+                if peak[k, 2] > pc:
+                    pc = peak[k, 2]
+            else:
+                c += kwh[k, 2]
+                if peak[k, 2] > pc:
+                    pc = peak[k, 2]
+        return a, b, c, pa, pb, pc
+
+else:
+    _aggregate = None
+
+# Below this many packs the plain loop beats the vectorized path's overhead.
+# Measured crossover is ~128 with the JIT kernel; NumPy alone did not beat the
+# table-driven loop up to 1024 packs, so it only kicks in for huge requests.
+# Without NumPy there is no vectorized path at all.
+if _aggregate is not None:
+    _VECTORIZE_MIN_PACKS = 128
+elif np is not None:
+    _VECTORIZE_MIN_PACKS = 2048
+else:
+    _VECTORIZE_MIN_PACKS = math.inf
+
+
+class Archetype(NamedTuple):
+    base_load_kwh_day: Band
+    base_peak_w: Band
+
+
+_ARCHETYPES: Dict[str, Archetype] = {
+    archetype_id: Archetype(
+        base_load_kwh_day=_safe_band(arch.get("base_load_kwh_day")),
+        base_peak_w=_safe_band(arch.get("base_peak_w")),
+    )
+    for archetype_id, arch in archetypes_db.items()
+    if arch
+}
+
+
+def _get_pack_table(group: str) -> PackTable:
+    return _pack_table(_pack_file(group))
+
+
+def warm_pack_tables() -> None:
+    """
+    Load every pack file and build its band table now instead of on the
+    first request that picks from it. The NumPy arrays stay lazy.
+    """
+    for filename in set(_PACK_FILES.values()):
+        _pack_table(filename)
+
+
+def _aggregate_rows(
+    filename: str,
+    rows: List[int],
+    usages: List[int],
+) -> Tuple[List[float], List[float]]:
+    kwh_table, peak_table = _pack_arrays(filename)
+    if _aggregate is not None:
+        a, b, c, pa, pb, pc = _aggregate(
+            kwh_table,
+            peak_table,
+            np.array(rows, dtype=np.int32),
+            np.array(usages, dtype=np.int8),
+        )
+        return [a, b, c], [pa, pb, pc]
+
+    idx = np.array(rows, dtype=np.intp)
+    mask = np.array(_USAGE_MASK)[np.array(usages, dtype=np.intp)]
+    kwh = np.where(mask, kwh_table[idx], 0.0).sum(axis=0)
+    peak = np.where(mask, peak_table[idx], 0.0).max(axis=0)
+    return kwh.tolist(), peak.tolist()
+
+
+def _aggregate_packs_vectorized(
+    packs: List[Dict[str, Any]],
+) -> Tuple[List[float], List[float]]:
+    """
+    Sum kwh and max peak per (min, avg, max) column over the picked packs.
+    Same result as the per-pack loop in compute_load_profile.
+    """
+    # pack file -> (rows, usage indexes) picked from it
+    picks: Dict[str, Tuple[List[int], List[int]]] = {}
+    for item in packs:
+        group = item.get("group", "ac1p")
+        key = item.get("key")
+        usage_index = int(item.get("usage_index", 1))
+        usage_index = max(0, min(usage_index, 2))
+
+        filename = _pack_file(group)
+        row = _pack_table(filename).rows.get(key)
+        if row is None:
+            continue
+        rows, usages = picks.setdefault(filename, ([], []))
+        rows.append(row)
+        usages.append(usage_index)
+
+    kwh_total = [0.0, 0.0, 0.0]
+    peak_total = [0.0, 0.0, 0.0]
+    for filename, (rows, usages) in picks.items():
+        kwh, peak = _aggregate_rows(filename, rows, usages)
+        kwh_total = [t + v for t, v in zip(kwh_total, kwh)]
+        peak_total = [max(t, v) for t, v in zip(peak_total, peak)]
+    return kwh_total, peak_total
 
 
 # ---------- Core calc logic ----------
@@ -63,6 +276,7 @@ def compute_load_profile(
     *,
     expert_mode: bool = False,
     packs: Optional[List[Dict[str, Any]]] = None,
+    _archetypes: Dict[str, Archetype] = _ARCHETYPES,
 ) -> Dict[str, Any]:
     packs = packs or []
 
@@ -71,11 +285,11 @@ def compute_load_profile(
 
     # Archetype baseline
     if not expert_mode and archetype_id:
-        arch = archetypes_db.get(archetype_id)
+        arch = _archetypes.get(archetype_id)
         if not arch:
             raise KeyError(f"Archetype '{archetype_id}' not found.")
-        b_min, b_avg, b_max = _safe_band(arch.get("base_load_kwh_day"))
-        p_min, p_avg, p_max = _safe_band(arch.get("base_peak_w"))
+        b_min, b_avg, b_max = arch.base_load_kwh_day
+        p_min, p_avg, p_max = arch.base_peak_w
 
         min_kwh += b_min
         avg_kwh += b_avg
@@ -85,46 +299,43 @@ def compute_load_profile(
         peak_max = max(peak_max, p_max)
 
     # Packs
-    for item in packs:
-        group = item.get("group", "ac1p")
-        key = item.get("key")
-        usage_index = int(item.get("usage_index", 1))
-        usage_index = max(0, min(usage_index, 2))
-
-        pack_db = _get_pack_db(group)
-        pack = pack_db.get(key)
-        if not pack:
-            continue
-
-        k_min, k_avg, k_max = _safe_band(pack.get("kwh_day"))
-        p_min, p_avg, p_max = _safe_band(pack.get("peak_w"))
-
-        kwh_band = (k_min, k_avg, k_max)
-        peak_band = (p_min, p_avg, p_max)
-
-        kwh_val = kwh_band[usage_index]
-        peak_val = peak_band[usage_index]
-
-        if usage_index == 0:
-            min_kwh += kwh_val
-        elif usage_index == 1:
-            avg_kwh += kwh_val
-        else:
-            max_kwh += kwh_val
-
-        if usage_index == 0:
-            peak_min = max(peak_min, peak_val)
-        elif usage_index == 1:
-            peak_avg = max(peak_avg, peak_val)
-        else:
-            peak_max = max(peak_max, peak_val)
-
-        # broaden band when "typical" is chosen
-        if usage_index == 1:
-            min_kwh += k_min
-            max_kwh += k_max
-            peak_min = max(peak_min, p_min)
-            peak_max = max(peak_max, p_max)
+    if len(packs) >= _VECTORIZE_MIN_PACKS:
+        (k_min, k_avg, k_max), (p_min, p_avg, p_max) = _aggregate_packs_vectorized(
+            packs
+        )
+        min_kwh += k_min
+        avg_kwh += k_avg
+        max_kwh += k_max
+        peak_min = max(peak_min, p_min)
+        peak_avg = max(peak_avg, p_avg)
+        peak_max = max(peak_max, p_max)
+    else:
+        # accumulators indexed by usage_index: (min, avg, max)
+        kwh_acc = [min_kwh, avg_kwh, max_kwh]
+        peak_acc = [peak_min, peak_avg, peak_max]
+        for item in packs:
+            group = item.get("group", "ac1p")
+            key = item.get("key")
+            usage_index = int(item.get("usage_index", 1))
+            usage_index = max(0, min(usage_index, 2))
+
+            bands = _get_pack_table(group).bands.get(key)
+            if not bands:
+                continue
+
+            kwh_band, peak_band = bands
+            kwh_acc[usage_index] += kwh_band[usage_index]
+            peak_acc[usage_index] = max(peak_acc[usage_index], peak_band[usage_index])
+
+            # broaden band when "typical" is chosen
+            if usage_index == 1:
+                kwh_acc[0] += kwh_band[0]
+                kwh_acc[2] += kwh_band[2]
+                peak_acc[0] = max(peak_acc[0], peak_band[0])
+                peak_acc[2] = max(peak_acc[2], peak_band[2])
+
+        min_kwh, avg_kwh, max_kwh = kwh_acc
+        peak_min, peak_avg, peak_max = peak_acc
 
     # consistency
     if max_kwh == 0 and avg_kwh > 0:
@@ -138,11 +349,8 @@ def compute_load_profile(
         "archetype": archetype_id,
         "expert_mode": expert_mode,
         "daily_kwh_band": [round(min_kwh, 3), round(avg_kwh, 3), round(max_kwh, 3)],
-        "peak_power_band_w": [
-            int(round(peak_min)),
-            int(round(peak_avg)),
-            int(round(peak_max)),
-        ],
+        # round() without ndigits already returns an int
+        "peak_power_band_w": [round(peak_min), round(peak_avg), round(peak_max)],
     }
 
 
@@ -195,10 +403,18 @@ def compute_savings_profile(
     year1_price = electricity_price_tl_per_kwh
     year1_savings = daily_offset_kwh * year1_price * 365.0
 
-    multi_year_savings = 0.0
-    for year in range(horizon_years):
-        price = electricity_price_tl_per_kwh * (1.0 + price_growth_rate) ** year
-        multi_year_savings += daily_offset_kwh * price * 365.0
+    # sum of price * (1 + g) ** year over the horizon, as a geometric series;
+    # expm1/log1p keep ((1 + g) ** H - 1) / g accurate for tiny g
+    g = price_growth_rate
+    if horizon_years <= 0:
+        growth_factor = 0.0
+    elif g == 0:
+        growth_factor = float(horizon_years)
+    elif g > -1.0:
+        growth_factor = math.expm1(horizon_years * math.log1p(g)) / g
+    else:
+        growth_factor = ((1.0 + g) ** horizon_years - 1.0) / g
+    multi_year_savings = year1_savings * growth_factor
 
     yearly_co2 = daily_co2_kg * 365.0
 
@@ -214,13 +430,44 @@ def compute_savings_profile(
     }
 
 
+class Tier(NamedTuple):
+    tier_id: str
+    capacity_wh: float
+    inverter_w: float
+    raw: Dict[str, Any]
+
+
+def _tier_view(
+    tiers_db: Dict[str, Any],
+) -> Tuple[List[float], List[Tier]]:
+    """
+    Usable tiers sorted by capacity, plus the matching capacity list for bisect.
+    """
+    tiers: List[Tier] = []
+    for tier_id, tier_data in tiers_db.items():
+        capacity_wh = tier_data.get("capacity_wh_total")
+        inverter_w = tier_data.get("inverter_w_continuous")
+        if capacity_wh is None or inverter_w is None:
+            continue
+        try:
+            capacity_wh = float(capacity_wh)
+            inverter_w = float(inverter_w)
+        except (TypeError, ValueError):
+            continue
+        tiers.append(Tier(tier_id, capacity_wh, inverter_w, tier_data))
+
+    tiers.sort(key=lambda t: t.capacity_wh)
+    return [t.capacity_wh for t in tiers], tiers
+
+
+_TIER_CAPS, _TIERS = _tier_view(ecoflow_tiers_db)
+
+
 def recommend_ecoflow_tiers(
     profile: Dict[str, Any],
     *,
-    tiers_db: Optional[Dict[str, Any]] = None,
+    tiers_db: Dict[str, Any] = ecoflow_tiers_db,
 ) -> List[Dict[str, Any]]:
-    tiers_db = tiers_db or ecoflow_tiers_db
-
     daily_band = _safe_band(profile.get("daily_kwh_band", [0, 0, 0]))
     peak_band = _safe_band(profile.get("peak_power_band_w", [0, 0, 0]))
 
@@ -230,26 +477,21 @@ def recommend_ecoflow_tiers(
     required_capacity_wh = typical_kwh * 1000.0
     required_inverter_w = peak_max * 1.2 if peak_max else 0.0
 
-    recommendations: List[Dict[str, Any]] = []
+    if tiers_db is ecoflow_tiers_db:
+        caps, tiers = _TIER_CAPS, _TIERS
+    else:
+        caps, tiers = _tier_view(tiers_db)
 
-    for tier_id, tier_data in tiers_db.items():
-        capacity_wh = tier_data.get("capacity_wh_total")
-        inverter_w = tier_data.get("inverter_w_continuous")
-        if capacity_wh is None or inverter_w is None:
-            continue
-        try:
-            capacity_wh = float(capacity_wh)
-            inverter_w = float(inverter_w)
-        except (TypeError, ValueError):
-            continue
+    recommendations: List[Dict[str, Any]] = []
 
-        if capacity_wh >= required_capacity_wh and inverter_w >= required_inverter_w:
-            tier_copy = dict(tier_data)
-            tier_copy.setdefault("tier_id", tier_id)
+    # tiers are sorted by capacity: skip straight to the first one that fits
+    start = bisect.bisect_left(caps, required_capacity_wh)
+    for tier in tiers[start:]:
+        if tier.inverter_w >= required_inverter_w:
+            tier_copy = dict(tier.raw)
+            tier_copy.setdefault("tier_id", tier.tier_id)
             recommendations.append(tier_copy)
 
-    recommendations.sort(key=lambda t: float(t.get("capacity_wh_total", 0)))
-
     if not recommendations:
         if "tier_2_comfort" in tiers_db:
             tier_copy = dict(tiers_db["tier_2_comfort"])
@@ -298,7 +540,7 @@ def calculate_energy_profile(
 
     profile: Dict[str, Any] = {
         **load_profile,
-        "selected_packs": [p.get("key") for p in resolved_packs],
+        "selected_packs": tuple(p.get("key") for p in resolved_packs),
     }
 
     if city and solar_wp and solar_wp > 0:
@@ -313,3 +555,17 @@ def calculate_energy_profile(
         profile["savings"] = savings_profile
 
     return profile
+
+
+# ---------- Warm-up ----------
+# Compile (or load from numba's on-disk cache) the JIT kernel at import, so the
+# first large request doesn't pay for it; under gunicorn preload_app the
+# compiled code is then shared by every worker.
+
+if _aggregate is not None and os.environ.get("APP_WARMUP", "1") == "1":
+    _aggregate(
+        np.zeros((0, 3)),
+        np.zeros((0, 3)),
+        np.zeros(0, dtype=np.int32),
+        np.zeros(0, dtype=np.int8),
+    )
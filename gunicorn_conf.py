@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for serving app:app in production.
+
+    gunicorn -c gunicorn_conf.py app:app
+
+Workers run the calc engine in parallel (one GIL each); threads cover
+socket I/O. With preload_app the datasets, pack band tables and the cached
+/api/init payload are built once in the master and shared copy-on-write.
+
+Every handler is CPU-bound today. If blocking outbound calls are added
+(e.g. live irradiance lookups per city), raise GUNICORN_THREADS first: a
+gthread worker keeps serving other requests while one thread waits.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+preload_app = True